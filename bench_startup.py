@@ -0,0 +1,80 @@
+# bench_startup.py
+
+import os, sys, json, argparse, subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# moduły, które nie mogą być ładowane przy starcie GUI
+LAZY_MODULES = ("pandas", "pyvisa", "lakeshore")
+
+# uruchamiane w świeżym interpreterze – mierzy import gui.py i pierwsze odrysowanie okna
+_PROBE = r"""
+import sys, time, json
+t0 = time.perf_counter()
+import gui
+t_import = time.perf_counter() - t0
+
+from PyQt5.QtCore import QObject, QEvent, QTimer
+from PyQt5.QtWidgets import QApplication
+
+class FirstPaint(QObject):
+    t = None
+    def eventFilter(self, obj, ev):
+        if ev.type() == QEvent.Paint and self.t is None:
+            self.t = time.perf_counter()
+            QTimer.singleShot(0, app.quit)
+        return False
+
+t1 = time.perf_counter()
+app = QApplication(sys.argv)
+window = gui.SweepApp()
+probe = FirstPaint(); window.installEventFilter(probe)
+window.show()
+QTimer.singleShot(5000, app.quit)
+app.exec_()
+window.close()
+print(json.dumps({
+    'import':      t_import,
+    'first_paint': (probe.t or time.perf_counter()) - t1,
+    'painted':     probe.t is not None,
+    'loaded':      [m for m in %r if m in sys.modules],
+}))
+"""
+
+def measure():
+    env = dict(os.environ)
+    if not env.get("DISPLAY") and sys.platform.startswith("linux"):
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    out = subprocess.run([sys.executable, "-c", _PROBE % (LAZY_MODULES,)],
+                         cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Pomiar czasu startu gui.py")
+    ap.add_argument("-n", "--runs", type=int, default=5)
+    ap.add_argument("--max-import", type=float, default=0.5, help="limit importu gui.py [s]")
+    ap.add_argument("--max-paint", type=float, default=1.0, help="limit do pierwszego odrysowania [s]")
+    args = ap.parse_args(argv)
+
+    runs = [measure() for _ in range(args.runs)]
+    imp   = sorted(r['import'] for r in runs)[len(runs)//2]
+    paint = sorted(r['first_paint'] for r in runs)[len(runs)//2]
+    loaded = sorted({m for r in runs for m in r['loaded']})
+    print(f"import gui.py:     {imp*1000:7.1f} ms (mediana z {len(runs)})")
+    print(f"pierwsze rysowanie: {paint*1000:7.1f} ms")
+
+    errors = []
+    if imp > args.max_import:
+        errors.append(f"import {imp:.3f} s > {args.max_import} s")
+    if paint > args.max_paint:
+        errors.append(f"pierwsze rysowanie {paint:.3f} s > {args.max_paint} s")
+    if not all(r['painted'] for r in runs):
+        errors.append("okno nie zostało odrysowane")
+    if loaded:
+        errors.append(f"przy starcie załadowano: {', '.join(loaded)}")
+    for e in errors:
+        print(f"[REGRESJA] {e}")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
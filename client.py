@@ -0,0 +1,91 @@
+# client.py
+
+import json
+from urllib.parse import urlencode
+# urllib.request (ssl, email) importowany przy pierwszym zapytaniu – skraca start GUI
+from utils import SERVER_HOST, SERVER_PORT
+
+# stany, w których zadanie już się nie zmieni (zob. server.py)
+FINISHED = ("done", "stopped", "cancelled", "failed")
+
+class MeasurementClient:
+    """
+    Klient lokalnego serwera pomiarowego (server.py).
+    Błędy zwrócone przez serwer zgłaszane są jako RuntimeError.
+    """
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, timeout=5.0):
+        self.base    = f"http://{host}:{port}"
+        self.timeout = timeout
+
+    def _call(self, method, path, payload=None):
+        import urllib.request, urllib.error
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        req = urllib.request.Request(self.base + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            try:
+                msg = json.loads(e.read().decode("utf-8"))['error']
+            except Exception:
+                msg = e.reason
+            raise RuntimeError(f"Serwer pomiarowy: {msg}")
+        except urllib.error.URLError as e:
+            raise RuntimeError(f"Brak połączenia z serwerem pomiarowym {self.base}: {e.reason}")
+
+    def submit(self, temps, freqs, output_dir, hiokis, lake="Symulowane urządzenie",
+               stabilize_time=30, tol=0.1, offset=0.0):
+        """Dodaj zadanie do kolejki; zwraca opis zadania (z polem 'id')."""
+        return self._call("POST", "/jobs", {
+            'lake': lake, 'hiokis': list(hiokis),
+            'temps': list(temps), 'freqs': list(freqs),
+            'stabilize_time': stabilize_time, 'tol': tol, 'offset': offset,
+            'output_dir': output_dir,
+        })
+
+    def jobs(self):
+        return self._call("GET", "/jobs")
+
+    def job(self, job_id):
+        return self._call("GET", f"/jobs/{job_id}")
+
+    def pause(self, job_id):
+        return self._call("POST", f"/jobs/{job_id}/pause")
+
+    def resume(self, job_id):
+        return self._call("POST", f"/jobs/{job_id}/resume")
+
+    def stop(self, job_id):
+        return self._call("POST", f"/jobs/{job_id}/stop")
+
+    def events(self, job_id=None, points=True, heartbeat=False):
+        """
+        Otwiera strumień /events i zwraca generator zdarzeń {'event','job','data'}.
+        Zdarzenia: 'job' (zmiana stanu), 'status', 'progress', 'point'.
+        Subskrypcja działa już po powrocie z tej metody, więc zdarzenia
+        wysłane później nie zostaną pominięte.
+        heartbeat=True → generator zwraca też None przy każdym keepalive
+        serwera (co ~1 s), żeby odbiorca mógł sprawdzić, czy ma skończyć.
+        """
+        query = {'points': '1' if points else '0'}
+        if job_id:
+            query['job'] = job_id
+        url = f"{self.base}/events?{urlencode(query)}"
+        import urllib.request, urllib.error
+        try:
+            resp = urllib.request.urlopen(url, timeout=self.timeout)
+        except urllib.error.URLError as e:
+            raise RuntimeError(f"Brak połączenia z serwerem pomiarowym {self.base}: {e.reason}")
+        return self._read_events(resp, heartbeat)
+
+    @staticmethod
+    def _read_events(resp, heartbeat):
+        with resp:
+            for line in resp:
+                line = line.decode("utf-8").rstrip("\r\n")
+                if line.startswith("data: "):
+                    yield json.loads(line[6:])
+                elif heartbeat and line.startswith(":"):
+                    yield None
@@ -0,0 +1,64 @@
+# discovery.py
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+class DeviceScanner(QObject):
+    """
+    Wyszukiwanie Lakeshore 335 i Hioki 3536 w tle (QThread).
+    Każde znalezione urządzenie zgłaszane jest od razu sygnałem.
+    """
+    visa_missing = pyqtSignal(str)
+    lake_found   = pyqtSignal(str)
+    hioki_found  = pyqtSignal(str)
+    finished     = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self._stopped = False
+
+    @pyqtSlot()
+    def stop(self):
+        """
+        Przerwij wyszukiwanie. Flaga sprawdzana jest przed każdym zapytaniem
+        *IDN?, więc bieżące zapytanie może jeszcze trwać do 2 s (timeout).
+        """
+        self._stopped = True
+
+    def run(self):
+        try:
+            import pyvisa
+            rm = pyvisa.ResourceManager()
+            resources = rm.list_resources()
+        except Exception as e:
+            self.visa_missing.emit(str(e))
+            self.finished.emit()
+            return
+
+        StopBits, Parity = pyvisa.constants.StopBits, pyvisa.constants.Parity
+        for r in resources:
+            if self._stopped:
+                break
+            try:
+                inst = rm.open_resource(r)
+                inst.baud_rate=57600; inst.data_bits=7
+                inst.stop_bits=StopBits.one; inst.parity=Parity.odd
+                inst.timeout=2000; inst.write_termination='\r\n'; inst.read_termination='\r\n'
+                if "335" in inst.query("*IDN?").upper():
+                    self.lake_found.emit(r); inst.close(); continue
+                inst.close()
+            except: pass
+            if self._stopped:
+                break
+            try:
+                inst = rm.open_resource(r)
+                inst.baud_rate=19200; inst.data_bits=8
+                inst.stop_bits=StopBits.one; inst.parity=Parity.none
+                inst.timeout=2000; inst.write_termination='\r\n'; inst.read_termination='\r\n'
+                if "3536" in inst.query("*IDN?").upper():
+                    self.hioki_found.emit(r)
+                inst.close()
+            except: pass
+
+        # bez rm.close(): pyvisa współdzieli ResourceManager, więc zamknąłby
+        # również sesje Hioki otwarte w międzyczasie przez pomiar
+        self.finished.emit()
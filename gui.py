@@ -1,18 +1,64 @@
 # gui.py
 
 import sys, os
-import pyvisa
-import pandas as pd
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QPushButton, QProgressBar, QComboBox, QListWidget,
     QListWidgetItem, QFileDialog, QMessageBox, QSpinBox,
-    QDoubleSpinBox, QAbstractItemView, QSplashScreen
+    QDoubleSpinBox, QAbstractItemView
 )
-from PyQt5.QtCore import Qt, QThread
-from PyQt5.QtGui import QPixmap, QFont
+from PyQt5.QtCore import Qt, QThread, QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QFont
 from instrument import Lakeshore335, Hioki3536, MockLakeshore335, MockHioki3536
 from measurement import SweepWorker
+from discovery import DeviceScanner
+from client import MeasurementClient, FINISHED
+
+class JobWatcher(QObject):
+    """
+    Odbiera w tle (QThread) zdarzenia zadania z serwera pomiarowego
+    i przekazuje je do GUI. finished niesie końcowy opis zadania
+    albo {'state': None, 'error': ...} po utracie połączenia.
+    """
+    status   = pyqtSignal(str)
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(dict)
+
+    def __init__(self, client, job_id):
+        super().__init__()
+        self.client   = client
+        self.job_id   = job_id
+        self._stopped = False
+
+    @pyqtSlot()
+    def stop(self):
+        """Przestań odbierać (najpóźniej po ~1 s keepalive); zadanie na serwerze trwa dalej."""
+        self._stopped = True
+
+    def run(self):
+        try:
+            # najpierw subskrypcja, potem stan – żadna zmiana nie umknie
+            stream = self.client.events(self.job_id, points=False, heartbeat=True)
+            job = self.client.job(self.job_id)
+            self.progress.emit(job['progress'])
+            try:
+                for ev in stream:
+                    if self._stopped or job['state'] in FINISHED:
+                        break
+                    if ev is None:
+                        continue
+                    if ev['event'] == 'status':
+                        self.status.emit(ev['data'])
+                    elif ev['event'] == 'progress':
+                        self.progress.emit(ev['data'])
+                    elif ev['event'] == 'job':
+                        job = ev['data']
+            finally:
+                stream.close()
+        except Exception as e:
+            job = {'state': None, 'error': str(e)}
+        if not self._stopped:
+            self.finished.emit(job)
 
 class SweepApp(QWidget):
     def __init__(self):
@@ -20,17 +66,21 @@ class SweepApp(QWidget):
         self.setWindowTitle("Program do wykonywania pomiarów Hioki i LakeShore")
         self.resize(700, 300)
 
-        # stan pomiaru
-        self.lake       = None
+        # stan pomiaru – sam pomiar wykonuje serwer (server.py)
+        self.client     = MeasurementClient()
         self.output_dir = None
-        self.worker     = None
+        self.job_id     = None
+        self.watcher    = None
         self.thread     = None
+        self.job_result = None
         self.measuring  = False
+        self.scanner    = None
+        self.scan_thread = None
 
         self._build_ui()
-        self._detect_devices()
-        self.cb_lake.currentIndexChanged.connect(self._init_lake)
-        self._init_lake()
+        self.cb_lake.addItem("Symulowane urządzenie")
+        self.cb_lake.currentIndexChanged.connect(self._on_lake_changed)
+        self._on_lake_changed()
 
     def _build_ui(self):
         layout = QVBoxLayout()
@@ -104,10 +154,7 @@ class SweepApp(QWidget):
 
         self.btn_start.clicked.connect(self.run_sweep)
         self.btn_pause.toggled.connect(self._on_pause_toggled)
-        self.btn_pause.toggled.connect(lambda p: self.worker.pause(p) if self.worker else None)
-        self.btn_stop.clicked.connect(lambda: (self.worker.stop() if self.worker else None,
-                                              self.lbl_status.setText("Zakończono pomiary"),
-                                              self.progress.setValue(0)))
+        self.btn_stop.clicked.connect(self._on_stop_clicked)
 
         # pasek + status
         self.progress   = QProgressBar()
@@ -119,58 +166,74 @@ class SweepApp(QWidget):
 
         self.setLayout(layout)
 
-    def _detect_devices(self):
-        # splash z kursorem "busy"
-        splash_pix = QPixmap(300,100); splash_pix.fill(Qt.white)
-        splash = QSplashScreen(splash_pix, Qt.WindowStaysOnTopHint)
-        splash.showMessage("Wyszukuję urządzenia…", Qt.AlignCenter, Qt.black)
-        splash.show()
-        QApplication.processEvents()
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-
-        rm = pyvisa.ResourceManager()
-        resources = rm.list_resources()
-        lakes, hiokis = ["Symulowane urządzenie"], []
-        for r in resources:
-            try:
-                inst = rm.open_resource(r)
-                inst.baud_rate=57600; inst.data_bits=7
-                inst.stop_bits=pyvisa.constants.StopBits.one; inst.parity=pyvisa.constants.Parity.odd
-                inst.timeout=2000; inst.write_termination='\r\n'; inst.read_termination='\r\n'
-                if "335" in inst.query("*IDN?").upper():
-                    lakes.append(r); inst.close(); continue
-                inst.close()
-            except: pass
-            try:
-                inst = rm.open_resource(r)
-                inst.baud_rate=19200; inst.data_bits=8
-                inst.stop_bits=pyvisa.constants.StopBits.one; inst.parity=pyvisa.constants.Parity.none
-                inst.timeout=2000; inst.write_termination='\r\n'; inst.read_termination='\r\n'
-                if "3536" in inst.query("*IDN?").upper():
-                    hiokis.append(r)
-                inst.close()
-            except: pass
-
-        QApplication.restoreOverrideCursor()
-        splash.finish(self)
-
-        self.cb_lake.clear(); self.cb_lake.addItems(lakes)
-        self.lst_hioki.clear()
-        for h in hiokis:
-            item = QListWidgetItem(h); item.setData(Qt.UserRole,h); item.setSelected(True)
-            self.lst_hioki.addItem(item)
-
-    def _init_lake(self):
-        if hasattr(self, 'lake') and self.lake:
-            try: self.lake.close()
-            except: pass
+    def start_discovery(self):
+        """Uruchom wyszukiwanie urządzeń w tle; wyniki trafiają na listy na bieżąco."""
+        if self.scan_thread: return
+        self.lbl_status.setText("Wyszukuję urządzenia…")
+        self.scanner = DeviceScanner()
+        self.scan_thread = QThread(self)
+        self.scanner.moveToThread(self.scan_thread)
+
+        self.scan_thread.started.connect(self.scanner.run)
+        self.scanner.lake_found.connect(self.cb_lake.addItem)
+        self.scanner.hioki_found.connect(self._add_hioki)
+        self.scanner.visa_missing.connect(self._on_visa_missing)
+        self.scanner.finished.connect(self.scan_thread.quit)
+        self.scanner.finished.connect(self.scanner.deleteLater)
+        self.scan_thread.finished.connect(self._on_discovery_finished)
+
+        self.scan_thread.start()
+
+    def _add_hioki(self, res):
+        item = QListWidgetItem(res); item.setData(Qt.UserRole,res); item.setSelected(True)
+        self.lst_hioki.addItem(item)
+
+    def _on_discovery_finished(self):
+        self.scan_thread = None
+        self.scanner     = None
+        if not self.measuring:
+            self.lbl_status.setText("Gotowy")
+
+    def _on_visa_missing(self, err):
+        QMessageBox.critical(
+            self,
+            "Brak oprogramowania VISA",
+            "Nie wykryto zainstalowanej biblioteki VISA.\n"
+            "Zainstaluj np. NI-VISA i uruchom program ponownie.\n\n"
+            f"Szczegóły: {err}"
+        )
+        self.close()
+        QApplication.exit(1)
+
+    def closeEvent(self, event):
+        if self.scan_thread:
+            # scanner mógł już zostać usunięty przez deleteLater po finished
+            try: self.scanner.stop()
+            except (RuntimeError, AttributeError): pass
+            self.scan_thread.quit()
+            self.scan_thread.wait()
+        if self.thread:
+            # zadanie trwa dalej na serwerze – kończymy tylko odbiór zdarzeń
+            try: self.watcher.stop()
+            except (RuntimeError, AttributeError): pass
+            self.thread.quit()
+            self.thread.wait()
+        super().closeEvent(event)
+
+    def _on_lake_changed(self):
+        real = not self.cb_lake.currentText().startswith("Symulowane urządzenie")
+        self.btn_heat_on .setEnabled(real)
+        self.btn_heat_off.setEnabled(real)
+
+    def _open_lake(self):
+        """
+        Otwiera wybrany Lakeshore tylko na czas akcji (grzałka, pomiar ręczny),
+        żeby port był wolny dla serwera pomiarowego. Wywołujący zamyka go sam.
+        """
         res = self.cb_lake.currentText()
         if res.startswith("Symulowane urządzenie"):
-            self.lake,ok = MockLakeshore335(),False
-        else:
-            self.lake,ok = Lakeshore335(res),True
-        self.btn_heat_on .setEnabled(ok)
-        self.btn_heat_off.setEnabled(ok)
+            return MockLakeshore335()
+        return Lakeshore335(res)
 
     def _add_mock(self):
         item = QListWidgetItem("Symulowane urządzenie"); item.setData(Qt.UserRole,"Symulowane urządzenie"); item.setSelected(True)
@@ -184,6 +247,7 @@ class SweepApp(QWidget):
     def _load_ranges(self):
         path,_ = QFileDialog.getOpenFileName(self,"Wczytaj Excel","", "Excel (*.xlsx *.xls)")
         if not path: return
+        import pandas as pd
         df = pd.read_excel(path, header=None)
         self.temps = df.iloc[:,0].dropna().tolist()
         self.freqs = df.iloc[:,1].dropna().tolist()
@@ -197,13 +261,19 @@ class SweepApp(QWidget):
 
     def _heater_on(self):
         try:
-            self.lake.enable_heater(); self.lbl_status.setText("Heater ON")
+            lake = self._open_lake()
+            try: lake.enable_heater()
+            finally: lake.close()
+            self.lbl_status.setText("Heater ON")
         except Exception as e:
             QMessageBox.warning(self,"Błąd",f"Heater ON:\n{e}")
 
     def _heater_off(self):
         try:
-            self.lake.disable_heater(); self.lbl_status.setText("Heater OFF")
+            lake = self._open_lake()
+            try: lake.disable_heater()
+            finally: lake.close()
+            self.lbl_status.setText("Heater OFF")
         except Exception as e:
             QMessageBox.warning(self,"Błąd",f"Heater OFF:\n{e}")
 
@@ -219,8 +289,6 @@ class SweepApp(QWidget):
                 self.lbl_status.setText("Anulowano"); self.measuring=False; return
             self.output_dir = fld
 
-        if not self.lake:
-            QMessageBox.warning(self,"Błąd","Wybierz Lakeshore!"); self.lbl_status.setText("Gotowy"); self.measuring=False; return
         hioki = [it.text() for it in self.lst_hioki.selectedItems()]
         if self.cb_lake.currentText()=="Symulowane urządzenie" and not hioki:
             QMessageBox.warning(self,"Błąd","Wybierz ≥1 Hioki lub symulowane urządzenie!")
@@ -229,69 +297,105 @@ class SweepApp(QWidget):
             QMessageBox.warning(self,"Błąd","Wczytaj Excel!")
             self.lbl_status.setText("Gotowy"); self.measuring=False; return
 
+        try:
+            job = self.client.submit(
+                self.temps, self.freqs, self.output_dir, hioki,
+                lake=self.cb_lake.currentText(),
+                stabilize_time=self.sb_stab.value(),
+                tol=self.ds_tol.value(),
+                offset=self.ds_off.value(),
+            )
+        except RuntimeError as e:
+            QMessageBox.warning(self,"Błąd",f"{e}\n\nUruchom serwer pomiarowy: python server.py")
+            self.lbl_status.setText("Gotowy"); self.measuring=False; return
+        self.job_id = job['id']
+
         self.btn_start.setEnabled(False)
         self.btn_pause.setEnabled(True)
         self.btn_stop .setEnabled(True)
+        self.btn_pause.blockSignals(True)
         self.btn_pause.setChecked(False)
+        self.btn_pause.blockSignals(False)
         self.btn_pause.setText("Pause")
+        if job['state'] == "queued":
+            self.lbl_status.setText("Zadanie w kolejce serwera…")
 
-        hioki_objs = [(n, MockHioki3536() if n=="Symulowane urządzenie" else Hioki3536(n)) for n in hioki]
-        self.worker = SweepWorker(
-            lake=self.lake, hiokis=hioki_objs,
-            temps=self.temps, freqs=self.freqs,
-            stabilize_time=self.sb_stab.value(),
-            tol=self.ds_tol.value(),
-            offset=self.ds_off.value(),
-            output_dir=self.output_dir
-        )
+        self.job_result = None
+        self.watcher = JobWatcher(self.client, self.job_id)
         self.thread = QThread(self)
-        self.worker.moveToThread(self.thread)
-
-        self.thread.started.connect(self.worker.run)
-        self.worker.status.connect(self.lbl_status.setText)
-        self.worker.progress.connect(self.progress.setValue)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
+        self.watcher.moveToThread(self.thread)
+
+        self.thread.started.connect(self.watcher.run)
+        self.watcher.status.connect(self.lbl_status.setText)
+        self.watcher.progress.connect(self.progress.setValue)
+        self.watcher.finished.connect(self._on_job_result)
+        self.watcher.finished.connect(self.thread.quit)
+        self.watcher.finished.connect(self.watcher.deleteLater)
         self.thread.finished.connect(self._on_finished)
 
         self.thread.start()
 
     def _on_pause_toggled(self, paused: bool):
-        if self.worker:
-            self.worker.pause(paused)
+        if not self.job_id: return
+        try:
+            if paused: self.client.pause(self.job_id)
+            else:      self.client.resume(self.job_id)
+        except RuntimeError as e:
+            QMessageBox.warning(self,"Błąd",str(e))
+            self.btn_pause.blockSignals(True)
+            self.btn_pause.setChecked(not paused)
+            self.btn_pause.blockSignals(False)
+            return
         self.btn_pause.setText("Resume" if paused else "Pause")
         self.lbl_status.setText("Zatrzymano wykonywanie pomiarów" if paused else "Wznawianie pomiarów...")
 
     def _on_stop_clicked(self):
-        if self.worker:
-            self.worker.stop()
-        self.lbl_status.setText("Zakończono pomiary")
-        self.progress.setValue(0)
+        if not self.job_id: return
+        try:
+            self.client.stop(self.job_id)
+        except RuntimeError as e:
+            QMessageBox.warning(self,"Błąd",str(e)); return
+        self.lbl_status.setText("Zatrzymywanie pomiarów…")
+
+    def _on_job_result(self, job):
+        self.job_result = job
 
     def _on_finished(self):
-        self.measuring = False
+        job = self.job_result or {}
+        self.measuring  = False
         self.thread     = None
-        self.worker     = None
-        self.lbl_status.setText("Pomiary zakończone")
+        self.watcher    = None
+        self.job_id     = None
+        state = job.get('state')
+        if state == "done":
+            self.lbl_status.setText("Pomiary zakończone")
+        elif state in ("stopped", "cancelled"):
+            self.lbl_status.setText("Zakończono pomiary")
+        else:
+            self.lbl_status.setText("Błąd pomiaru")
+            QMessageBox.warning(self,"Błąd pomiaru", job.get('error') or "Nieznany błąd serwera")
         self.progress.setValue(0)
         self.btn_start.setEnabled(True)
         self.btn_pause.setEnabled(False)
+        self.btn_pause.blockSignals(True)
         self.btn_pause.setChecked(False)
+        self.btn_pause.blockSignals(False)
         self.btn_pause.setText("Pause")
         self.btn_stop .setEnabled(False)
+
     def _manual_measure(self):
-        if not self.worker:
-            # utwórz tymczasowego worker’a do pomiaru ręcznego
-            hioki_objs = [(it.text(),
-                        MockHioki3536() if it.text().startswith("Symulowane")
-                        else Hioki3536(it.text()))
-                        for it in self.lst_hioki.selectedItems()]
-            if not hioki_objs:
-                QMessageBox.warning(self, "Błąd", "Nie wybrano żadnego Hioki.")
-                return
-
-            self.worker = SweepWorker(
-                lake=self.lake,
+        names = [it.text() for it in self.lst_hioki.selectedItems()]
+        if not names:
+            QMessageBox.warning(self, "Błąd", "Nie wybrano żadnego Hioki.")
+            return
+        # przyrządy otwierane tylko na czas pomiaru – porty zostają wolne dla serwera
+        lake, hioki_objs = None, []
+        try:
+            lake = self._open_lake()
+            for n in names:
+                hioki_objs.append((n, MockHioki3536() if n.startswith("Symulowane") else Hioki3536(n)))
+            worker = SweepWorker(
+                lake=lake,
                 hiokis=hioki_objs,
                 temps=[],
                 freqs=getattr(self, "freqs", []),
@@ -300,45 +404,20 @@ class SweepApp(QWidget):
                 offset=self.ds_off.value(),
                 output_dir=self.output_dir
             )
-        try:
-            temp, results = self.worker.manual_measure()
+            temp, results = worker.manual_measure()
             self.lbl_status.setText(f"Ręczny pomiar zakończony przy T={temp:.2f} K")
         except Exception as e:
             QMessageBox.warning(self, "Błąd pomiaru", str(e))
+        finally:
+            for _, meter in hioki_objs:
+                meter.close()
+            if lake is not None:
+                lake.close()
 
 
 if __name__ == "__main__":
-    try:
-        import pyvisa
-        rm = pyvisa.ResourceManager()
-        _ = rm.list_resources()
-    except Exception as e:
-        app = QApplication(sys.argv)
-        QMessageBox.critical(
-            None,
-            "Brak oprogramowania VISA",
-            "Nie wykryto zainstalowanej biblioteki VISA.\n"
-            "Zainstaluj np. NI-VISA i uruchom program ponownie.\n\n"
-            f"Szczegóły: {e}"
-        )
-        sys.exit(1)
-    app = QApplication(sys.argv)
-    window = SweepApp()
-    window.show()
-    sys.exit(app.exec_())
-
     app = QApplication(sys.argv)
-
-    # splash-screen z kółkiem kursora
-    pix = QPixmap(300,100)
-    pix.fill(Qt.white)
-    splash = QSplashScreen(pix, Qt.WindowStaysOnTopHint)
-    splash.showMessage("Wyszukuję urządzenia…", Qt.AlignCenter, Qt.black)
-    splash.show()
-    app.processEvents()
-
     window = SweepApp()
-    splash.finish(window)
-
     window.show()
+    window.start_discovery()
     sys.exit(app.exec_())
@@ -1,10 +1,9 @@
 # instrument.py
 
-import pyvisa
 import time
 import random
-from pyvisa import constants
-from lakeshore import Model335
+# pyvisa i lakeshore importowane dopiero przy otwarciu prawdziwego przyrządu,
+# żeby start GUI i symulatory nie płaciły za ich import
 
 class MockLakeshore335:
     """Symulator kontrolera temperatury."""
@@ -19,6 +18,12 @@ class MockLakeshore335:
         current = self._target + random.uniform(-0.1, 0.1)
         print(f"[MOCK Lake] odczyt temperatury: {current:.2f} K")
         return current
+    def enable_heater(self, channel=2):
+        print("[MOCK Lake] grzałka ON")
+
+    def disable_heater(self, channel=2):
+        print("[MOCK Lake] grzałka OFF")
+
     def close(self):
         pass
 
@@ -40,6 +45,9 @@ class MockHioki3536:
         print(f"[MOCK Hioki] pomiar: {data}")
         return data
 
+    def close(self):
+        pass
+
 class Lakeshore335:
     """
     Sterownik Lake Shore Model 335 przez lake-shore-python-driver.
@@ -47,6 +55,7 @@ class Lakeshore335:
     """
 
     def __init__(self, resource_name, baud_rate=57600, timeout=2.0):
+        from lakeshore import Model335
         if resource_name.upper().startswith("ASRL"):
             # wyciągam numer portu COM z nazwy VISA
             num = resource_name[4:resource_name.find("::")]
@@ -110,6 +119,8 @@ class Lakeshore335:
 
 class Hioki3536:
     def __init__(self, resource_name):
+        import pyvisa
+        from pyvisa import constants
         rm = pyvisa.ResourceManager()
         if resource_name.upper().startswith("ASRL"):
             self.dev = rm.open_resource(
@@ -134,6 +145,13 @@ class Hioki3536:
     def set_frequency(self, freq_hz):
         self.dev.write(f"FREQ {freq_hz:.0f}")
 
+    def close(self):
+        """Zamknij sesję VISA (pozostałe sesje ResourceManagera zostają otwarte)."""
+        try:
+            self.dev.close()
+        except Exception:
+            pass
+
     def measure_all(self):
         time.sleep(0.05)
         """
@@ -1,16 +1,16 @@
 # measurement.py
 
 import os, time
-import pandas as pd
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 
 class SweepWorker(QObject):
     status   = pyqtSignal(str)
     progress = pyqtSignal(int)
+    point    = pyqtSignal(dict)
     finished = pyqtSignal()
 
     def __init__(self, lake, hiokis, temps, freqs,
-                 stabilize_time, tol, offset, output_dir):
+                 stabilize_time, tol, offset, output_dir, cooldown=True):
         super().__init__()
         self.lake       = lake
         self.hiokis     = hiokis
@@ -20,6 +20,8 @@ class SweepWorker(QObject):
         self.tol        = tol
         self.offset     = offset
         self.output_dir = output_dir
+        # False → po zakończeniu nie wracaj do 300 K (kolejne zadanie czeka)
+        self.cooldown   = cooldown
         self._stopped = False
         self._paused  = False
 
@@ -32,6 +34,7 @@ class SweepWorker(QObject):
         self._paused = paused
 
     def run(self):
+        import pandas as pd
         total = len(self.temps) * len(self.freqs) * len(self.hiokis)
         step  = 0
 
@@ -55,6 +58,7 @@ class SweepWorker(QObject):
             last_within = None
             while not self._stopped:
                 if self._paused:
+                    time.sleep(0.1)
                     continue
 
                 raw = self.lake.get_temperature()
@@ -81,8 +85,8 @@ class SweepWorker(QObject):
             for f in self.freqs:
                 if self._stopped:
                     break
-                while self._paused:
-                    pass
+                while self._paused and not self._stopped:
+                    time.sleep(0.1)
 
                 for name, meter in self.hiokis:
                     self.status.emit(f"[{name}] f={f:.1f} Hz")
@@ -100,6 +104,7 @@ class SweepWorker(QObject):
                         'Rp':    meas['Rp'],
                     }
                     data_per[name].append(entry)
+                    self.point.emit({'Device': name, **entry})
                     self.progress.emit(int(step/total*100))
 
             # zapis pliku dla tej temperatury i każdego miernika
@@ -111,6 +116,9 @@ class SweepWorker(QObject):
                 df.to_csv(os.path.join(folder, filename), index=False)
 
         # po wszystkim (lub stop) – schłódź i wyłącz grzałkę
+        if not self.cooldown and not self._stopped:
+            self.finished.emit()
+            return
         if not self._stopped:
             try:
                 self.status.emit("Cooldown → 300 K")
@@ -124,6 +132,7 @@ class SweepWorker(QObject):
         """
         Ręczny pomiar
         """
+        import pandas as pd
         try:
             curr_temp = float(self.lake.get_temperature()) + self.offset
         except Exception as e:
@@ -0,0 +1,551 @@
+# server.py
+
+import os, sys, json, time, uuid, queue, threading, argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from instrument import Lakeshore335, Hioki3536, MockLakeshore335, MockHioki3536
+from measurement import SweepWorker
+from utils import SERVER_HOST, SERVER_PORT
+
+SIMULATED = "Symulowane urządzenie"
+
+# stany zadań
+QUEUED, RUNNING, PAUSED = "queued", "running", "paused"
+DONE, STOPPED, CANCELLED, FAILED = "done", "stopped", "cancelled", "failed"
+ACTIVE = (RUNNING, PAUSED)
+
+
+class MeasurementService:
+    """
+    Kolejka zadań pomiarowych wykonywanych po kolei w osobnym wątku.
+    Stan kolejki zapisywany jest do pliku JSON. Przyrządy pozostają
+    otwarte pomiędzy zadaniami i są zwalniane, gdy kolejka się opróżni,
+    żeby GUI albo inny program mógł otworzyć te same porty.
+    """
+
+    def __init__(self, state_file=None):
+        self.state_file   = state_file
+        self._cond        = threading.Condition()
+        self._jobs        = []        # kolejność = kolejność wykonywania
+        self._subscribers = []        # (queue, job_id, points)
+        self._worker      = None
+        self._current     = None
+        self._stop_req    = False
+        self._pause_req   = False
+        self._finishing   = False     # worker zakończył, stan jeszcze nie zapisany
+        self._running     = False
+        self._thread      = None
+
+        # "ciepłe" przyrządy – otwarte, dopóki w kolejce są zadania
+        self._lake     = None
+        self._lake_res = None
+        self._lake_hot = False    # grzałka zostawiona na następne zadanie
+        self._hiokis   = {}
+
+        self._load()
+
+    # ---------- cykl życia ----------
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Przerwij bieżące zadanie, zatrzymaj wątek kolejki i zamknij przyrządy.
+        Przerwane zadanie wraca do kolejki i wystartuje od nowa po restarcie.
+        """
+        with self._cond:
+            self._running = False
+            if self._worker:
+                self._worker.stop()
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._close_instruments()
+
+    # ---------- API zadań ----------
+
+    def submit(self, spec):
+        """Dodaj zadanie do kolejki i zwróć jego opis."""
+        params = self._validate(spec)
+        job = {
+            'id':       uuid.uuid4().hex[:8],
+            'state':    QUEUED,
+            'params':   params,
+            'status':   "",
+            'progress': 0,
+            'error':    None,
+            'created':  time.time(),
+            'started':  None,
+            'finished': None,
+        }
+        with self._cond:
+            self._jobs.append(job)
+            # bieżące zadanie nie schładza układu – zaraz startuje następne
+            if self._worker:
+                self._worker.cooldown = False
+            self._save()
+            self._cond.notify_all()
+            snapshot = dict(job)
+        self._publish('job', job['id'], snapshot)
+        return snapshot
+
+    def jobs(self):
+        with self._cond:
+            return [dict(j) for j in self._jobs]
+
+    def job(self, job_id):
+        with self._cond:
+            return dict(self._find(job_id))
+
+    def pause(self, job_id, paused=True):
+        with self._cond:
+            job = self._find(job_id)
+            if job['state'] not in ACTIVE:
+                raise ValueError(f"Zadanie {job_id} nie jest wykonywane")
+            if self._finishing:
+                raise ValueError(f"Zadanie {job_id} właśnie się kończy")
+            self._pause_req = paused
+            if self._worker:
+                self._worker.pause(paused)
+            job['state'] = PAUSED if paused else RUNNING
+            self._save()
+            snapshot = dict(job)
+        self._publish('job', job_id, snapshot)
+        return snapshot
+
+    def resume(self, job_id):
+        return self.pause(job_id, False)
+
+    def stop(self, job_id):
+        """Zatrzymaj wykonywane zadanie lub anuluj zadanie z kolejki."""
+        with self._cond:
+            job = self._find(job_id)
+            if job['state'] in ACTIVE:
+                if self._finishing:
+                    raise ValueError(f"Zadanie {job_id} właśnie się kończy")
+                self._stop_req = True
+                if self._worker:
+                    self._worker.stop()
+            elif job['state'] == QUEUED:
+                job['state'] = CANCELLED
+                job['finished'] = time.time()
+                # bez następnego zadania bieżące musi jednak schłodzić układ
+                if self._worker:
+                    self._worker.cooldown = self._next_queued() is None
+                self._save()
+                self._cond.notify_all()
+            else:
+                raise ValueError(f"Zadanie {job_id} jest już zakończone")
+            snapshot = dict(job)
+        self._publish('job', job_id, snapshot)
+        return snapshot
+
+    # ---------- subskrypcje ----------
+
+    def subscribe(self, job_id=None, points=True, maxsize=1000):
+        """
+        Zwraca kolejkę zdarzeń {'event','job','data'}.
+        job_id=None → wszystkie zadania; points=False → bez punktów pomiarowych.
+        """
+        q = queue.Queue(maxsize)
+        with self._cond:
+            self._subscribers.append((q, job_id, points))
+        return q
+
+    def unsubscribe(self, q):
+        with self._cond:
+            self._subscribers = [s for s in self._subscribers if s[0] is not q]
+
+    def _publish(self, event, job_id, data):
+        msg = {'event': event, 'job': job_id, 'data': data}
+        with self._cond:
+            subs = list(self._subscribers)
+        for q, only, points in subs:
+            if only is not None and only != job_id:
+                continue
+            if event == 'point' and not points:
+                continue
+            # wolny odbiorca: punkty/status/postęp gubimy zamiast blokować pomiar,
+            # ale zmiana stanu zadania ('job') musi dotrzeć – wypiera najstarsze
+            while True:
+                try:
+                    q.put_nowait(msg)
+                    break
+                except queue.Full:
+                    if event != 'job':
+                        break
+                try: q.get_nowait()
+                except queue.Empty: pass
+
+    # ---------- wykonywanie ----------
+
+    def _run_loop(self):
+        while True:
+            with self._cond:
+                while (self._running and self._next_queued() is None
+                       and self._lake is None and not self._hiokis):
+                    self._cond.wait()
+                if not self._running:
+                    return
+                job = self._next_queued()
+                switch = (job is not None and self._lake_hot
+                          and job['params']['lake'] != self._lake_res)
+                if job is not None and not switch:
+                    job['state']   = RUNNING
+                    job['started'] = time.time()
+                    self._current  = job
+                    self._stop_req = False
+                    self._pause_req = False
+                    self._finishing = False
+                    self._save()
+                    snapshot = dict(job)
+            if job is None:
+                # kolejka pusta – schłodź i zwolnij porty
+                self._close_instruments()
+                continue
+            if switch:
+                # następne zadanie używa innego kontrolera – ten nie zostanie przejęty
+                self._cool_lake()
+                continue
+            self._publish('job', job['id'], snapshot)
+            self._run_job(job)
+
+    def _run_job(self, job):
+        p = job['params']
+        try:
+            lake   = self._open_lake(p['lake'])
+            hiokis = [(n, self._open_hioki(n)) for n in p['hiokis']]
+        except Exception as e:
+            self._finish(job, FAILED, f"Nie udało się otworzyć przyrządów: {e}")
+            return
+
+        # worker tworzony w tym wątku → sygnały dostarczane bezpośrednio
+        worker = SweepWorker(
+            lake=lake, hiokis=hiokis,
+            temps=p['temps'], freqs=p['freqs'],
+            stabilize_time=p['stabilize_time'],
+            tol=p['tol'], offset=p['offset'],
+            output_dir=p['output_dir'],
+        )
+        worker.status.connect(lambda s: self._on_status(job, s))
+        worker.progress.connect(lambda v: self._on_progress(job, v))
+        worker.point.connect(lambda d: self._publish('point', job['id'], d))
+
+        with self._cond:
+            worker.cooldown = self._next_queued() is None
+            self._worker = worker
+            worker.pause(self._pause_req)
+            if self._stop_req or not self._running:
+                worker.stop()
+
+        try:
+            worker.run()
+        except Exception as e:
+            with self._cond:
+                self._finishing = True
+            self._lake_hot = True
+            self._evict(p)
+            self._finish(job, FAILED, str(e))
+            return
+
+        with self._cond:
+            # od tej chwili stop()/pause() nie zmieniają już wyniku zadania
+            self._finishing = True
+            complete = job['progress'] >= 100
+            stopped  = self._stop_req and not complete
+            shutdown = not self._running and not complete
+            # po stop() worker nie wyłącza grzałki, nawet gdy zmierzył wszystko
+            self._lake_hot = not worker.cooldown or self._stop_req or not self._running
+        if stopped:
+            self._finish(job, STOPPED)
+        elif shutdown:
+            self._finish(job, QUEUED)    # zamknięcie serwera
+        else:
+            self._finish(job, DONE)
+
+    def _finish(self, job, state, error=None):
+        with self._cond:
+            job['state']    = state
+            job['error']    = error
+            job['finished'] = time.time()
+            if state == DONE:
+                job['progress'] = 100
+            elif state == QUEUED:
+                job['started'], job['finished'], job['progress'] = None, None, 0
+            self._worker  = None
+            self._current = None
+            self._save()
+            snapshot = dict(job)
+        self._publish('job', job['id'], snapshot)
+
+    def _on_status(self, job, text):
+        with self._cond:
+            job['status'] = text
+        self._publish('status', job['id'], text)
+
+    def _on_progress(self, job, value):
+        with self._cond:
+            job['progress'] = value
+        self._publish('progress', job['id'], value)
+
+    # ---------- przyrządy ----------
+
+    def _open_lake(self, res):
+        if self._lake is not None and self._lake_res == res:
+            return self._lake
+        if self._lake is not None:
+            try: self._lake.close()
+            except: pass
+            self._lake = None
+        self._lake = MockLakeshore335() if res == SIMULATED else Lakeshore335(res)
+        self._lake_res = res
+        return self._lake
+
+    def _cool_lake(self):
+        """Setpoint 300 K i wyłączenie grzałki na bieżącym kontrolerze."""
+        if self._lake is not None:
+            try:
+                self._lake.set_temperature(300.0)
+                self._lake.disable_heater()
+            except Exception as e:
+                print(f"[SERVER] Nie udało się schłodzić {self._lake_res}: {e}")
+        self._lake_hot = False
+
+    def _open_hioki(self, res):
+        if res == SIMULATED:
+            return MockHioki3536()
+        if res not in self._hiokis:
+            self._hiokis[res] = Hioki3536(res)
+        return self._hiokis[res]
+
+    def _evict(self, params):
+        """Zamknij przyrządy zadania zakończonego błędem – następne otworzy je od nowa."""
+        if self._lake is not None and self._lake_res == params['lake']:
+            self._cool_lake()
+            try: self._lake.close()
+            except: pass
+            self._lake, self._lake_res = None, None
+        for name in params['hiokis']:
+            meter = self._hiokis.pop(name, None)
+            if meter is not None:
+                try: meter.close()
+                except: pass
+
+    def _close_instruments(self):
+        if self._lake_hot:
+            self._cool_lake()
+        if self._lake is not None:
+            try: self._lake.close()
+            except: pass
+        for meter in self._hiokis.values():
+            try: meter.close()
+            except: pass
+        self._lake, self._lake_res, self._hiokis = None, None, {}
+
+    # ---------- pomocnicze ----------
+
+    def _find(self, job_id):
+        for j in self._jobs:
+            if j['id'] == job_id:
+                return j
+        raise KeyError(f"Nie ma zadania {job_id}")
+
+    def _next_queued(self):
+        for j in self._jobs:
+            if j['state'] == QUEUED:
+                return j
+        return None
+
+    @staticmethod
+    def _validate(spec):
+        if not isinstance(spec, dict):
+            raise ValueError("Opis zadania musi być obiektem JSON")
+        try:
+            params = {
+                'lake':           str(spec.get('lake', SIMULATED)),
+                'hiokis':         [str(h) for h in spec.get('hiokis', [])],
+                'temps':          [float(t) for t in spec['temps']],
+                'freqs':          [float(f) for f in spec['freqs']],
+                'stabilize_time': float(spec.get('stabilize_time', 30)),
+                'tol':            float(spec.get('tol', 0.1)),
+                'offset':         float(spec.get('offset', 0.0)),
+                'output_dir':     str(spec['output_dir']),
+            }
+        except KeyError as e:
+            raise ValueError(f"Brak pola {e.args[0]!r} w opisie zadania")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Niepoprawny opis zadania: {e}")
+        if not params['hiokis']:
+            raise ValueError("Wybierz ≥1 Hioki lub symulowane urządzenie!")
+        if not params['temps'] or not params['freqs']:
+            raise ValueError("Lista temperatur i częstotliwości nie może być pusta")
+        return params
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        with open(self.state_file, encoding="utf-8") as fh:
+            self._jobs = json.load(fh).get('jobs', [])
+        # zadania przerwane zamknięciem serwera wracają do kolejki
+        for j in self._jobs:
+            if j['state'] in ACTIVE:
+                j['state'], j['started'], j['progress'] = QUEUED, None, 0
+
+    def _save(self):
+        if not self.state_file:
+            return
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({'jobs': self._jobs}, fh, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.state_file)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    GET  /jobs                        – lista zadań
+    POST /jobs                        – nowe zadanie (JSON)
+    GET  /jobs/<id>                   – stan zadania
+    POST /jobs/<id>/pause|resume|stop – sterowanie
+    GET  /events[?job=<id>&points=0]  – strumień zdarzeń (text/event-stream)
+    """
+
+    keepalive = 1.0       # s; pozwala klientom (GUI) szybko zakończyć odbiór
+    allowed_hosts = ("127.0.0.1", "localhost")
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, action):
+        try:
+            self._reply(200, action())
+        except KeyError as e:
+            self._reply(404, {'error': e.args[0]})
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+        except Exception as e:
+            self._reply(500, {'error': str(e)})
+
+    def _refuse(self, post=False):
+        """
+        Odrzuć żądania, które mogła wysłać strona WWW otwarta w przeglądarce:
+        z nagłówkiem Origin, z obcym Host (DNS rebinding) albo – dla POST –
+        bez Content-Type: application/json (formularz/fetch bez preflight).
+        """
+        if self.headers.get("Origin") is not None:
+            self._reply(403, {'error': "Żądania z przeglądarki są niedozwolone"})
+            return True
+        host = (self.headers.get("Host") or "").rsplit(":", 1)[0]
+        if host not in self.allowed_hosts:
+            self._reply(403, {'error': f"Niedozwolony nagłówek Host: {host!r}"})
+            return True
+        ctype = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if post and ctype != "application/json":
+            self._reply(415, {'error': "Wymagany Content-Type: application/json"})
+            return True
+        return False
+
+    def do_GET(self):
+        if self._refuse():
+            return
+        url   = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        if parts == ['jobs']:
+            self._dispatch(self.service.jobs)
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            self._dispatch(lambda: self.service.job(parts[1]))
+        elif parts == ['events']:
+            query = parse_qs(url.query)
+            self._stream(query.get('job', [None])[0],
+                         query.get('points', ['1'])[0] not in ('0', 'false'))
+        else:
+            self._reply(404, {'error': f"Nieznana ścieżka {url.path}"})
+
+    def do_POST(self):
+        if self._refuse(post=True):
+            return
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        if parts == ['jobs']:
+            self._dispatch(lambda: self.service.submit(self._read_json()))
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] in ('pause', 'resume', 'stop'):
+            self._dispatch(lambda: getattr(self.service, parts[2])(parts[1]))
+        else:
+            self._reply(404, {'error': f"Nieznana ścieżka {self.path}"})
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Niepoprawny JSON: {e}")
+
+    def _stream(self, job_id, points):
+        q = self.service.subscribe(job_id, points)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                try:
+                    msg = q.get(timeout=self.keepalive)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    data = json.dumps(msg, ensure_ascii=False)
+                    self.wfile.write(f"event: {msg['event']}\ndata: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.service.unsubscribe(q)
+
+
+def make_server(service, host=SERVER_HOST, port=SERVER_PORT):
+    """Serwer HTTP dla `service`; port=0 wybiera wolny port."""
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    httpd.daemon_threads = True
+    httpd.service = service
+    return httpd
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Lokalny serwer pomiarowy Hioki/LakeShore")
+    ap.add_argument("--host", default=SERVER_HOST)
+    ap.add_argument("--port", type=int, default=SERVER_PORT)
+    ap.add_argument("--state", default="jobs.json", help="plik z kolejką zadań")
+    args = ap.parse_args(argv)
+
+    service = MeasurementService(args.state)
+    httpd = make_server(service, args.host, args.port)
+    service.start()
+    print(f"[SERVER] nasłuchuję na http://{args.host}:{httpd.server_address[1]}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+# test_server.py
+
+import os, json, time, threading
+import http.client
+import pytest
+import server
+from server import MeasurementService, make_server, SIMULATED
+from client import MeasurementClient
+
+class RecordingLakeshore(server.MockLakeshore335):
+    """Cichy symulator, który zapisuje setpointy i stan grzałki."""
+    log = []
+
+    def set_temperature(self, T):
+        self._target = T
+        self.log.append(T)
+
+    def get_temperature(self):
+        # zawsze 0.5 K od setpointu: tol=1 → stabilny od razu, tol=0.1 → nigdy
+        time.sleep(0.01)
+        return self._target + 0.5
+
+    def disable_heater(self, channel=2):
+        self.log.append('off')
+
+def wait_for(pred, timeout=10.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if pred():
+            return
+        time.sleep(0.02)
+    raise AssertionError("upłynął limit czasu")
+
+@pytest.fixture
+def spec(tmp_path):
+    return dict(hiokis=[SIMULATED], freqs=[100, 1000], output_dir=str(tmp_path),
+                stabilize_time=0, tol=1)
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "MockLakeshore335", RecordingLakeshore)
+    monkeypatch.setattr(RecordingLakeshore, "log", [])
+    service = MeasurementService(str(tmp_path / "jobs.json"))
+    httpd = make_server(service, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    service.start()
+    yield service, MeasurementClient(port=httpd.server_address[1])
+    httpd.shutdown(); httpd.server_close()
+    service.close()
+
+def state(client, job):
+    return client.job(job['id'])['state']
+
+def test_submit_runs_to_done(served, spec, tmp_path):
+    service, client = served
+    job = client.submit(temps=[10, 20], **spec)
+    wait_for(lambda: state(client, job) == "done")
+    assert client.job(job['id'])['progress'] == 100
+    assert sorted(os.listdir(tmp_path / SIMULATED)) == ["10.0.csv", "20.0.csv"]
+    # ostatnie zadanie w kolejce schładza układ, a porty są zwalniane
+    assert RecordingLakeshore.log[-2:] == ['off', 300.0]
+    wait_for(lambda: service._lake is None)
+
+def test_pause_resume_stop(served, spec):
+    _, client = served
+    job = client.submit(temps=[10], **dict(spec, tol=0.1))
+    wait_for(lambda: state(client, job) == "running")
+    assert client.pause(job['id'])['state'] == "paused"
+    assert client.resume(job['id'])['state'] == "running"
+    client.stop(job['id'])
+    wait_for(lambda: state(client, job) == "stopped")
+    with pytest.raises(RuntimeError):
+        client.stop(job['id'])
+
+def test_cancel_queued_job(served, spec):
+    _, client = served
+    a = client.submit(temps=[10], **dict(spec, tol=0.1))
+    wait_for(lambda: state(client, a) == "running")
+    b = client.submit(temps=[20], **spec)
+    assert client.stop(b['id'])['state'] == "cancelled"
+    client.stop(a['id'])
+    wait_for(lambda: state(client, a) == "stopped")
+    assert 20.0 not in RecordingLakeshore.log
+
+def test_cancel_restores_cooldown(served, spec):
+    _, client = served
+    a = client.submit(temps=[10, 20], **spec)
+    wait_for(lambda: state(client, a) == "running")
+    client.pause(a['id'])
+    b = client.submit(temps=[30], **spec)
+    client.stop(b['id'])
+    client.resume(a['id'])
+    wait_for(lambda: state(client, a) == "done")
+    wait_for(lambda: 'off' in RecordingLakeshore.log)
+    assert 30.0 not in RecordingLakeshore.log
+    assert RecordingLakeshore.log[-1] == 300.0
+
+def test_failed_next_job_cools_controller(served, spec):
+    _, client = served
+    a = client.submit(temps=[10], **dict(spec, tol=0.1))
+    wait_for(lambda: state(client, a) == "running")
+    b = client.submit(temps=[20], **dict(spec, hiokis=["NIEISTNIEJE::INSTR"]))
+    client.stop(a['id'])
+    wait_for(lambda: state(client, b) == "failed")
+    wait_for(lambda: 'off' in RecordingLakeshore.log)
+
+def test_stop_after_last_point_keeps_done(served, spec, monkeypatch):
+    service, client = served
+
+    class LateStop(server.SweepWorker):
+        def run(self):
+            super().run()
+            # stop() dociera po ostatnim punkcie, zanim zadanie zostało zapisane
+            service.stop(service._current['id'])
+
+    monkeypatch.setattr(server, "SweepWorker", LateStop)
+    job = client.submit(temps=[10], **spec)
+    wait_for(lambda: state(client, job) not in ("queued", "running"))
+    assert state(client, job) == "done"
+    with pytest.raises(RuntimeError, match="zakończone"):
+        client.stop(job['id'])
+    with pytest.raises(RuntimeError, match="nie jest wykonywane"):
+        client.pause(job['id'])
+
+def test_failed_job_evicts_instruments(served, spec, monkeypatch):
+    _, client = served
+    opened = []
+
+    class BrokenHioki:
+        def __init__(self, res):
+            self.dev, self.closed = self, False
+            opened.append(self)
+        def close(self):
+            self.closed = True
+        def set_frequency(self, f):
+            pass
+        def measure_all(self):
+            raise RuntimeError("zerwane połączenie")
+
+    monkeypatch.setattr(server, "Hioki3536", BrokenHioki)
+    s = dict(spec, hiokis=["ASRL7::INSTR"])
+    a = client.submit(temps=[10], **s)
+    b = client.submit(temps=[20], **s)
+    wait_for(lambda: state(client, b) == "failed")
+    assert state(client, a) == "failed"
+    assert len(opened) == 2 and opened[0].closed
+    assert 'off' in RecordingLakeshore.log
+
+def test_reload_from_state_file(served, spec, tmp_path):
+    service, client = served
+    a = client.submit(temps=[10], **dict(spec, tol=0.1))
+    wait_for(lambda: state(client, a) == "running")
+    b = client.submit(temps=[20], **spec)
+    service.close()
+
+    reloaded = MeasurementService(str(tmp_path / "jobs.json"))
+    jobs = {j['id']: j for j in reloaded.jobs()}
+    assert jobs[a['id']]['state'] == "queued"
+    assert jobs[b['id']]['state'] == "queued"
+
+def test_events_stream(served, spec):
+    _, client = served
+    events = []
+    listening = threading.Event()
+
+    def listen():
+        listening.set()
+        for ev in client.events():
+            events.append(ev)
+            if ev['event'] == "job" and ev['data']['state'] == "done":
+                return
+
+    t = threading.Thread(target=listen, daemon=True); t.start()
+    listening.wait(); time.sleep(0.2)
+    job = client.submit(temps=[10, 20], **spec)
+    t.join(10)
+    assert not t.is_alive()
+    points = [e['data'] for e in events if e['event'] == "point"]
+    assert len(points) == 4
+    assert {p['Temp'] for p in points} == {10.0, 20.0}
+    assert all(e['job'] == job['id'] for e in events)
+    assert any(e['event'] == "progress" for e in events)
+
+def test_full_subscriber_still_gets_job_events(served, spec):
+    service, client = served
+    q = service.subscribe(maxsize=2)
+    job = client.submit(temps=[10, 20], **spec)
+    wait_for(lambda: state(client, job) == "done")
+    events = [q.get_nowait() for _ in range(q.qsize())]
+    assert events[-1]['event'] == "job"
+    assert events[-1]['data']['state'] == "done"
+
+def test_invalid_requests(served):
+    _, client = served
+    with pytest.raises(RuntimeError, match="Nie ma zadania"):
+        client.job("brak")
+    with pytest.raises(RuntimeError, match="freqs"):
+        client._call("POST", "/jobs", {'temps': [10], 'hiokis': [SIMULATED]})
+
+def raw_request(client, method, path, headers, body=None):
+    port = int(client.base.rsplit(":", 1)[1])
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.putrequest(method, path, skip_host=True, skip_accept_encoding=True)
+    headers = dict({'Host': f"127.0.0.1:{port}"}, **headers)
+    if body is not None:
+        headers['Content-Length'] = str(len(body))
+    for k, v in headers.items():
+        conn.putheader(k, v)
+    conn.endheaders(body)
+    resp = conn.getresponse()
+    resp.read(); conn.close()
+    return resp.status
+
+JOB = json.dumps({'temps': [900], 'freqs': [100], 'hiokis': [SIMULATED],
+                  'output_dir': "x"}).encode()
+
+def test_rejects_non_json_post(served):
+    service, client = served
+    status = raw_request(client, "POST", "/jobs", {'Content-Type': "text/plain"}, JOB)
+    assert status == 415
+    assert service.jobs() == []
+
+def test_rejects_browser_origin(served):
+    service, client = served
+    headers = {'Content-Type': "application/json", 'Origin': "http://evil.example"}
+    assert raw_request(client, "POST", "/jobs", headers, JOB) == 403
+    assert raw_request(client, "GET", "/jobs", {'Origin': "http://evil.example"}) == 403
+    assert service.jobs() == []
+
+def test_rejects_foreign_host(served):
+    service, client = served
+    headers = {'Content-Type': "application/json", 'Host': "evil.example:8765"}
+    assert raw_request(client, "POST", "/jobs", headers, JOB) == 403
+    assert raw_request(client, "GET", "/jobs", {'Host': "evil.example"}) == 403
+    assert service.jobs() == []
+    assert raw_request(client, "GET", "/jobs", {'Host': "localhost"}) == 200
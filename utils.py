@@ -1,6 +1,10 @@
 # utils.py
 import os
 
+# adres lokalnego serwera pomiarowego (server.py / client.py)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
 def save_results(df, filename, out_folder="results"):
     os.makedirs(out_folder, exist_ok=True)
     path = os.path.join(out_folder, filename)